@@ -1,5 +1,6 @@
 import asyncio
 import logging
+from datetime import timedelta
 
 from dotenv import load_dotenv
 from flask import request, jsonify
@@ -9,8 +10,8 @@ from src.app_services.scrape import make_task
 from src.datastore.models import db, Request, Progress, Review
 from src import create_app
 from src.scraper.scraper_service import HTMLScraper
-from src.worker.queue import RedisQueue
-from src.worker.worker import ScrapeWorker, Publisher
+from src.worker.queue import RedisQueue, InMemoryQueue
+from src.worker.worker import ScrapeWorker, Publisher, RefreshScheduler, RetentionWorker, RetryWorker
 from src.writer.writer import CSVWriter
 
 
@@ -19,13 +20,38 @@ logger = logging.getLogger(__name__)
 
 app = create_app()
 
-redis = RedisQueue(host=app.config['REDIS_HOST'])
+if app.config['QUEUE_BACKEND'] == 'memory':
+    queue = InMemoryQueue()
+else:
+    queue = RedisQueue(host=app.config['REDIS_HOST'], port=int(app.config['REDIS_PORT']))
 scraper = HTMLScraper()
-worker = ScrapeWorker(redis, scraper, db)
+worker = ScrapeWorker(
+    queue, scraper, db,
+    max_attempts=app.config['RETRY_MAX_ATTEMPTS'],
+    base_delay=timedelta(seconds=app.config['RETRY_BASE_DELAY_SECONDS']),
+    max_delay=timedelta(seconds=app.config['RETRY_MAX_DELAY_SECONDS']),
+)
+retry_worker = RetryWorker(worker, concurrency=app.config['RETRY_CONCURRENCY'])
+refresher = RefreshScheduler(
+    worker, db,
+    budget=app.config['REFRESH_BUDGET_PER_MINUTE'],
+    lead_time=timedelta(seconds=app.config['REFRESH_LEAD_SECONDS']),
+    half_life=timedelta(seconds=app.config['REFRESH_HALF_LIFE_SECONDS']),
+    min_hits=app.config['REFRESH_MIN_HITS'],
+)
 
 writer = CSVWriter()
 mail_service = app.extensions["mail"]
-publisher = Publisher(redis, db, writer, mail_service)
+publisher = Publisher(queue, db, writer, mail_service)
+retention = RetentionWorker(
+    db,
+    interval=timedelta(seconds=app.config['RETENTION_INTERVAL_SECONDS']),
+    chunk_size=app.config['RETENTION_CHUNK_SIZE'],
+    review_ttl=timedelta(days=app.config['REVIEW_RETENTION_DAYS']),
+    request_ttl=timedelta(days=app.config['REQUEST_RETENTION_DAYS']),
+    temp_ttl=timedelta(hours=app.config['TEMP_RETENTION_HOURS']),
+    vacuum_pages=app.config['VACUUM_PAGES'],
+)
 
 
 @app.route('/scrape', methods=['POST'])
@@ -38,24 +64,44 @@ def submit_request():
     db.session.add(user_request)
     db.session.commit()
 
+    items = []
     for url in urls:
+        refresher.hit(url)
         if make_task(url, user_request.id):
-            asyncio.run(worker.start({'url': url}))
+            items.append({'url': url, 'request_id': user_request.id})
+    asyncio.run(worker.start_many(items))
 
     return jsonify({'message': 'Request submitted successfully', 'request_id': user_request.id}), 200
 
 
+@app.route('/dead-letter', methods=['GET'])
+def dead_letter():
+    limit = request.args.get('limit', 100, type=int)
+    if limit < 1:
+        return jsonify({'message': 'limit must be at least 1'}), 400
+
+    items = asyncio.run(queue.range('dead_letter', 0, limit - 1))
+
+    return jsonify({'count': asyncio.run(queue.len('dead_letter')), 'items': items}), 200
+
+
 async def main():
     pass
     logger.info('App starting...')
     worker_task = asyncio.create_task(worker.listen(app.app_context()))
     publisher_task = asyncio.create_task(publisher.listen(app.app_context()))
+    refresher_task = asyncio.create_task(refresher.listen(app.app_context()))
+    retention_task = asyncio.create_task(retention.listen(app.app_context()))
+    retry_task = asyncio.create_task(retry_worker.listen(app.app_context()))
 
     loop = asyncio.get_running_loop()
     loop.run_in_executor(None, app.run, '0.0.0.0', 5000)
 
     await worker_task
     await publisher_task
+    await refresher_task
+    await retention_task
+    await retry_task
 
 
 if __name__ == '__main__':
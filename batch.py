@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+import logging
+
+from src.app_services.batch import BatchRunner, Checkpoint
+from src.writer.writer import CSVWriter, JSONLWriter
+
+
+logging.basicConfig(level=logging.INFO)
+
+
+def get_scraper(name):
+    if name == 'playwright':
+        from src.scraper.playwright_scraper_service import PlaywrightScraper
+        return PlaywrightScraper()
+
+    from src.scraper.scraper_service import HTMLScraper
+    return HTMLScraper()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Scrape a file of review URLs straight to CSV/JSONL.')
+    parser.add_argument('urls', help='file with one review URL per line')
+    parser.add_argument('output', help='output file, .jsonl for JSON lines, CSV otherwise')
+    parser.add_argument('--checkpoint', help='resume file (default: <output>.ckpt)')
+    parser.add_argument('--scraper', choices=['html', 'playwright'], default='html')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--flush-every', type=int, default=100)
+    parser.add_argument('--retries', type=int, default=3, help='retries for transient failures')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    writer = JSONLWriter() if args.output.endswith('.jsonl') else CSVWriter()
+    checkpoint = Checkpoint(args.checkpoint or f'{args.output}.ckpt')
+    runner = BatchRunner(get_scraper(args.scraper), writer, args.output, checkpoint,
+                         concurrency=args.concurrency, flush_every=args.flush_every, retries=args.retries)
+
+    asyncio.run(runner.run(args.urls))
@@ -4,6 +4,7 @@ from flask import Flask
 from flask_mail import Mail
 
 from src.datastore import db
+from src.datastore.migrations import migrate
 from src.config import config
 
 
@@ -23,6 +24,7 @@ def create_app(config_name=None):
 
     db.init_app(app)
     with app.app_context():
+        migrate(db)
         db.create_all()
 
     # shell context for flask cli
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+from src.scraper import IScraper, TransientScrapeError
+from src.writer import OutputWriter
+
+logger = logging.getLogger(__name__)
+
+
+def url_key(url: str):
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class Checkpoint:
+    """
+    Append-only record of the URLs already written to the output, one 16 char
+    hash per line. Lines are only added after the matching rows were flushed,
+    so a crashed run can at worst repeat the last chunk. Failed URLs are never
+    added, a resumed run tries them again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as checkpoint:
+                self.done.update(line.strip() for line in checkpoint if line.strip())
+
+    def __contains__(self, url):
+        return url_key(url) in self.done
+
+    def add(self, urls):
+        keys = [url_key(url) for url in urls]
+        with open(self.path, 'a', encoding='utf-8') as checkpoint:
+            checkpoint.writelines(key + '\n' for key in keys)
+        self.done.update(keys)
+
+
+def read_urls(file_path: str):
+    seen = set()
+    with open(file_path, 'r', encoding='utf-8') as urls:
+        for line in urls:
+            url = line.strip()
+            if url and url not in seen:
+                seen.add(url)
+                yield url
+
+
+class BatchRunner:
+    """
+    Scrapes every URL of a file straight into an output file, without the
+    Flask app, Redis, the datastore or email.
+    """
+
+    def __init__(self, scraper: IScraper, writer: OutputWriter, output_path: str, checkpoint: Checkpoint,
+                 failed_path: str = None, concurrency=20, flush_every=100, report_every=5,
+                 retries=3, retry_delay=2):
+        self.scraper = scraper
+        self.writer = writer
+        self.output_path = output_path
+        self.checkpoint = checkpoint
+        self.failed_path = failed_path or f'{output_path}.failed'
+        self.concurrency = concurrency
+        self.flush_every = flush_every
+        self.report_every = report_every
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.results = []
+        self.scraped = 0
+        self.failed = 0
+
+    async def run(self, urls_path: str):
+        todo = [url for url in read_urls(urls_path) if url not in self.checkpoint]
+        logger.info(f'{len(todo)} URLs to scrape, {len(self.checkpoint.done)} already done')
+
+        # failures are never checkpointed, every run retries them and records them afresh
+        open(self.failed_path, 'w', encoding='utf-8').close()
+
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self.consume(queue)) for _ in range(self.concurrency)]
+        producer = asyncio.create_task(self.produce(queue, todo))
+        reporter = asyncio.create_task(self.report(len(todo)))
+
+        try:
+            # consumers only ever finish by raising, stop on the first one instead of
+            # waiting on a queue nobody drains any more
+            done, _ = await asyncio.wait([producer, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in workers + [producer, reporter]:
+                task.cancel()
+            self.flush()
+
+        logger.info(f'Finished: {self.scraped} scraped, {self.failed} failed (see {self.failed_path})')
+
+    async def produce(self, queue: asyncio.Queue, todo):
+        for url in todo:
+            await queue.put(url)
+        await queue.join()
+
+    async def consume(self, queue: asyncio.Queue):
+        while True:
+            url = await queue.get()
+            try:
+                result = await self.scrape(url)
+                if result is not None:
+                    self.scraped += 1
+                    self.results.append(result)
+                    if len(self.results) >= self.flush_every:
+                        self.flush()
+            finally:
+                queue.task_done()
+
+    async def scrape(self, url):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.scraper.scrape(url)
+            except TransientScrapeError as e:
+                error = e
+                if attempt < self.retries:
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            except Exception as e:
+                error = e
+                break
+
+        logger.debug(f'{url} -- {error}')
+        self.failed += 1
+        kind = 'transient' if isinstance(error, TransientScrapeError) else 'permanent'
+        with open(self.failed_path, 'a', encoding='utf-8') as failed:
+            failed.write(json.dumps({'url': url, 'kind': kind, 'error': str(error)}, ensure_ascii=False) + '\n')
+
+        return None
+
+    def flush(self):
+        if not self.results:
+            return
+
+        results, self.results = self.results, []
+        self.writer.append(self.output_path, results)
+        self.checkpoint.add(result['url'] for result in results)
+
+    async def report(self, total):
+        started = time.monotonic()
+        while True:
+            await asyncio.sleep(self.report_every)
+            elapsed = time.monotonic() - started
+            processed = self.scraped + self.failed
+            rate = processed / elapsed if elapsed else 0
+            eta = (total - processed) / rate if rate else float('inf')
+            logger.info(f'{self.scraped}/{total} scraped, {self.failed} failed, {rate:.1f} URL/s, ETA {eta:.0f}s')
@@ -4,16 +4,21 @@ from datetime import datetime, timedelta
 
 from src import db
 from src.datastore.models import Review, Progress, ProgressStatus
+from src.datastore.utils import get_or_create_review_id
 
 logger = logging.getLogger(__name__)
 
+REVIEW_TTL = timedelta(minutes=30)
+
 
 def make_task(url, request_id):
-    progress = Progress(request_id=request_id, url=url)
+    review_id = get_or_create_review_id(db, url)
+    progress = Progress(request_id=request_id, review_id=review_id)
 
-    review: Review = Review.query.filter_by(url=url).first()
-    if review is not None:
-        cond2 = datetime.now() - review.updated_at < timedelta(minutes=30)
+    review: Review = db.session.get(Review, review_id)
+    # placeholder rows (content is None) have never been scraped
+    if review.content is not None:
+        cond2 = datetime.now() - review.updated_at < REVIEW_TTL
         cond3 = "Error" not in [review.location, review.reviewer, review.content]
         if cond2 and cond3:
             progress.status = ProgressStatus.NOTIFYING
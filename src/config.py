@@ -13,9 +13,27 @@ class BaseConfig:
 
     SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI', f'sqlite:///{db_dir}')
 
+    QUEUE_BACKEND = os.environ.get("QUEUE_BACKEND", "redis")
     REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
     REDIS_PORT = os.environ.get("REDIS_PORT", 6379)
 
+    REFRESH_BUDGET_PER_MINUTE = int(os.environ.get("REFRESH_BUDGET_PER_MINUTE", 30))
+    REFRESH_LEAD_SECONDS = int(os.environ.get("REFRESH_LEAD_SECONDS", 300))
+    REFRESH_HALF_LIFE_SECONDS = int(os.environ.get("REFRESH_HALF_LIFE_SECONDS", 3600))
+    REFRESH_MIN_HITS = float(os.environ.get("REFRESH_MIN_HITS", 2))
+
+    RETRY_MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", 5))
+    RETRY_BASE_DELAY_SECONDS = int(os.environ.get("RETRY_BASE_DELAY_SECONDS", 30))
+    RETRY_MAX_DELAY_SECONDS = int(os.environ.get("RETRY_MAX_DELAY_SECONDS", 3600))
+    RETRY_CONCURRENCY = int(os.environ.get("RETRY_CONCURRENCY", 5))
+
+    RETENTION_INTERVAL_SECONDS = int(os.environ.get("RETENTION_INTERVAL_SECONDS", 3600))
+    RETENTION_CHUNK_SIZE = int(os.environ.get("RETENTION_CHUNK_SIZE", 500))
+    REVIEW_RETENTION_DAYS = int(os.environ.get("REVIEW_RETENTION_DAYS", 30))
+    REQUEST_RETENTION_DAYS = int(os.environ.get("REQUEST_RETENTION_DAYS", 7))
+    TEMP_RETENTION_HOURS = int(os.environ.get("TEMP_RETENTION_HOURS", 24))
+    VACUUM_PAGES = int(os.environ.get("VACUUM_PAGES", 1000))
+
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.googlemail.com")
     MAIL_PORT = os.environ.get("MAIL_PORT", 587)
     MAIL_USE_TLS = os.environ.get("MAIL_USE_TLS", True)
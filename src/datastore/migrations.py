@@ -0,0 +1,111 @@
+import logging
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+
+from src.datastore.models import Review, Progress
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(db: SQLAlchemy):
+    enable_incremental_vacuum(db)
+    upgrade_review_ids(db)
+    sync_indexes(db)
+
+
+def enable_incremental_vacuum(db: SQLAlchemy):
+    """
+    Switches SQLite to incremental auto-vacuum so RetentionWorker can give
+    freed pages back in small steps. An existing database needs one full
+    VACUUM for the setting to take effect.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if conn.execute(text('PRAGMA auto_vacuum')).scalar() == 2:
+            return
+
+        conn.execute(text('PRAGMA auto_vacuum = INCREMENTAL'))
+        if inspect(conn).get_table_names():
+            logger.info('Enabling incremental auto-vacuum')
+            conn.execute(text('VACUUM'))
+
+
+def upgrade_review_ids(db: SQLAlchemy):
+    """
+    Upgrades a database created with the url-keyed schema in place.
+
+    `review` gains an integer surrogate key and `progress` references it
+    through `review_id` instead of repeating the url. Progress rows whose url
+    has never been scraped get an empty placeholder review.
+    """
+    inspector = inspect(db.engine)
+    tables = inspector.get_table_names()
+    if 'review' not in tables:
+        return
+
+    if 'id' in [column['name'] for column in inspector.get_columns('review')]:
+        return
+
+    logger.info('Migrating review/progress tables to integer review ids')
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('ALTER TABLE review RENAME TO review_old')
+        if 'progress' in tables:
+            conn.exec_driver_sql('ALTER TABLE progress RENAME TO progress_old')
+
+        db.metadata.create_all(conn, tables=[Review.__table__, Progress.__table__])
+
+        conn.exec_driver_sql(
+            'INSERT INTO review (url, updated_at, location, reviewer, content) '
+            'SELECT url, updated_at, location, reviewer, content FROM review_old'
+        )
+
+        if 'progress' in tables:
+            # progress rows whose request is gone were orphaned by the old
+            # ORM cascade (SQLite does not enforce foreign keys), drop them
+            conn.exec_driver_sql(
+                'INSERT OR IGNORE INTO review (url, updated_at) '
+                'SELECT p.url, MIN(p.created_at) FROM progress_old p '
+                'JOIN request q ON q.id = p.request_id GROUP BY p.url'
+            )
+            conn.exec_driver_sql(
+                'INSERT INTO progress (id, request_id, review_id, status, created_at) '
+                'SELECT p.id, p.request_id, r.id, p.status, p.created_at '
+                'FROM progress_old p JOIN request q ON q.id = p.request_id '
+                'JOIN review r ON r.url = p.url'
+            )
+            conn.exec_driver_sql('DROP TABLE progress_old')
+
+        conn.exec_driver_sql('DROP TABLE review_old')
+        conn.exec_driver_sql('ANALYZE')
+
+    logger.info('Migration done')
+
+
+def sync_indexes(db: SQLAlchemy):
+    """
+    Creates the indexes declared on the models that an existing database is
+    missing, and rebuilds those whose columns changed. create_all only does
+    this for new tables.
+    """
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        tables = inspector.get_table_names()
+
+        for table in [Review.__table__, Progress.__table__]:
+            if table.name not in tables:
+                continue
+
+            existing = {index['name']: index['column_names'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                columns = [column.name for column in index.columns]
+                if existing.get(index.name) == columns:
+                    continue
+
+                if index.name in existing:
+                    index.drop(conn)
+                logger.info(f'Creating index {index.name}')
+                index.create(conn)
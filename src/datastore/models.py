@@ -1,7 +1,6 @@
 from datetime import datetime
 from enum import IntEnum
 from sqlalchemy.orm import relationship
-from sqlalchemy import ForeignKeyConstraint
 
 from src.datastore import db
 from src.utils import generate_id
@@ -15,8 +14,10 @@ class ProgressStatus(IntEnum):
 
 
 class Review(db.Model):
-    url = db.Column(db.String, primary_key=True)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String, nullable=False, unique=True)
+    # RetentionWorker.expire_reviews: updated_at < ?
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
     location = db.Column(db.String, nullable=True)
     reviewer = db.Column(db.String, nullable=True)
     content = db.Column(db.Text, nullable=True)
@@ -32,12 +33,22 @@ class Request(db.Model):
 
 class Progress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    request_id = db.Column(db.Integer, db.ForeignKey('request.id'), nullable=False)
-    url = db.Column(db.Integer, db.ForeignKey('review.url'), nullable=False)
+    request_id = db.Column(db.String, db.ForeignKey('request.id', ondelete='CASCADE'), nullable=False)
+    review_id = db.Column(db.Integer, db.ForeignKey('review.id'), nullable=False)
     status = db.Column(db.Integer, default=ProgressStatus.PENDING)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
-    # Define composite foreign key constraint
+    review = relationship("Review")
+
+    # Covering indexes for the worker/publisher hot paths
     __table_args__ = (
-        ForeignKeyConstraint(['request_id'], ['request.id'], ondelete='CASCADE'),
+        # ScrapeWorker.priority_item: status = ? AND created_at < ?
+        db.Index('ix_progress_status_created_at', 'status', 'created_at', 'review_id', 'request_id'),
+        # Publisher.get_notify: DISTINCT request_id WHERE status = ?
+        db.Index('ix_progress_status_request_id', 'status', 'request_id'),
+        # Publisher.notify: WHERE request_id = ?
+        db.Index('ix_progress_request_id_status', 'request_id', 'status', 'review_id'),
+        # RetentionWorker.expire_reviews: NOT EXISTS (... WHERE review_id = ?),
+        # ScrapeWorker.save_results: review_id IN (...)
+        db.Index('ix_progress_review_id_status', 'review_id', 'status'),
     )
@@ -28,6 +28,26 @@ def bulk_insert_or_update(db: SQLAlchemy, values):
         logger.debug(e)
 
 
+def get_or_create_review_id(db: SQLAlchemy, url):
+    stmt = insert(Review).values(url=url).on_conflict_do_nothing(index_elements=[Review.url])
+    db.session.execute(stmt)
+
+    return db.session.query(Review.id).filter(Review.url == url).scalar()
+
+
+def delete_requests(db: SQLAlchemy, request_ids):
+    """Bulk deletes requests and their progress rows without loading them into the session."""
+    request_ids = list(request_ids)
+    if not request_ids:
+        return 0
+
+    db.session.query(Progress).filter(Progress.request_id.in_(request_ids)).delete(synchronize_session=False)
+    deleted = db.session.query(Request).filter(Request.id.in_(request_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+    return deleted
+
+
 def model_to_list(model_obj, *args):
     if not model_obj:
         return None
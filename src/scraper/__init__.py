@@ -1,7 +1,23 @@
 from abc import ABC, abstractmethod
 
 
+class ScrapeError(Exception):
+    pass
+
+
+class TransientScrapeError(ScrapeError):
+    """Timeouts, rate limiting and server errors, worth retrying later."""
+
+
+class PermanentScrapeError(ScrapeError):
+    """The page cannot be scraped as it is, retrying will not help."""
+
+
 class IScraper(ABC):
     @abstractmethod
     async def scrape(self, url) -> dict:
+        """
+        Returns the review as a dict, raises TransientScrapeError or
+        PermanentScrapeError when it cannot be scraped.
+        """
         raise NotImplementedError("Subclasses must implement this method.")
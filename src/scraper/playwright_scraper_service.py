@@ -1,8 +1,8 @@
 import logging
 
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 
-from . import IScraper
+from . import IScraper, ScrapeError, TransientScrapeError, PermanentScrapeError
 from src.utils import singleton
 
 
@@ -28,7 +28,9 @@ class PlaywrightScraper(IScraper):
                 page = await context.new_page()
 
                 try:
-                    await page.goto(url, wait_until="load", timeout=_NAVIGATION_TIMEOUT)
+                    response = await page.goto(url, wait_until="load", timeout=_NAVIGATION_TIMEOUT)
+                    if response is not None and (response.status == 429 or response.status >= 500):
+                        raise TransientScrapeError(f'HTTP {response.status}')
                     await page.wait_for_timeout(_CONTENT_WAIT_MS)
 
                     location_meta = await page.locator('meta[property="og:title"]').get_attribute('content')
@@ -47,6 +49,14 @@ class PlaywrightScraper(IScraper):
                     return result
                 finally:
                     await context.close()
-        except Exception:  # noqa: BLE001
-            logger.exception("Failed to scrape review for %s", url)
-            return {'url': url, 'location': 'Error', 'reviewer': 'Error', 'content': 'Error'}
+        except ScrapeError:
+            raise
+        except PlaywrightTimeoutError as e:
+            raise TransientScrapeError(f'Timeout: {e}') from e
+        except PlaywrightError as e:
+            # network level failures (net::ERR_*) are worth another attempt
+            if 'net::' in e.message:
+                raise TransientScrapeError(e.message) from e
+            raise PermanentScrapeError(e.message) from e
+        except Exception as e:  # noqa: BLE001
+            raise PermanentScrapeError(f'{type(e).__name__}: {e}') from e
@@ -1,30 +1,63 @@
 import aiohttp
+import asyncio
 import re
 import logging
+from urllib.parse import urlparse
 from bs4 import BeautifulSoup
 
-from . import IScraper
+from . import IScraper, ScrapeError, TransientScrapeError, PermanentScrapeError
 from src.utils import singleton
 
 
 logger = logging.getLogger(__name__)
 
+_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+
+def is_transient_status(status):
+    return status == 429 or status >= 500
+
 
 @singleton
 class HTMLScraper(IScraper):
     async def scrape(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            raise PermanentScrapeError(f'Invalid URL: {url}')
+
+        try:
+            return await self._scrape(url)
+        except ScrapeError:
+            raise
+        except aiohttp.InvalidURL as e:
+            # subclasses ClientError, but retrying a malformed url will not help
+            raise PermanentScrapeError(f'Invalid URL: {e}') from e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TransientScrapeError(f'{type(e).__name__}: {e}') from e
+        except Exception as e:
+            raise PermanentScrapeError(f'{type(e).__name__}: {e}') from e
+
+    async def _scrape(self, url):
         result = {'url': url, 'location': 'Deleted', 'reviewer': 'Deleted', 'content': 'Deleted'}
 
-        async with (aiohttp.ClientSession() as session):
+        async with (aiohttp.ClientSession(timeout=_TIMEOUT) as session):
             redirect_url = ''
             async with session.get(url, allow_redirects=False) as response:
-                location = str(response).split("Location': \'")[1].split("\'")[0]
+                if is_transient_status(response.status):
+                    raise TransientScrapeError(f'HTTP {response.status}')
+                location = response.headers.get('Location', '')
                 redirect_url = location.replace('hl=vi', 'hl=en')
 
+            if response.status == 404:
+                return result
+
             if not redirect_url:
-                return {'url': url, 'location': 'Error', 'reviewer': 'Error', 'content': 'Error'}
+                raise PermanentScrapeError(f'No redirect for {url} (HTTP {response.status})')
 
             async with session.get(redirect_url) as response:
+                if is_transient_status(response.status):
+                    raise TransientScrapeError(f'HTTP {response.status}')
+
                 if response.status == 200:
                     content = await response.text()
                     soup = BeautifulSoup(content, 'html.parser')
@@ -1,5 +1,7 @@
+import math
 import os
 import uuid
+from collections import deque
 from flask_mail import Mail, Message
 
 
@@ -18,6 +20,24 @@ def generate_id():
     return str(uuid.uuid4())
 
 
+class RollingPercentile:
+    """Keeps the last `size` samples and reports nearest-rank percentiles over them."""
+
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+
+        ordered = sorted(self.samples)
+        rank = max(math.ceil(p / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+
 def send_email_with_attachment(mail: Mail, recipient: str, subject: str, body: str, attachment_path: str):
     """
     Sends an email with an attachment using Flask-Mail.
@@ -19,6 +19,14 @@ class MQueue(ABC):
     async def pop(self, queue=None):
         raise NotImplementedError("Subclasses must implement this method.")
 
+    @abstractmethod
+    async def push_many(self, items, queue=None):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    @abstractmethod
+    async def pop_many(self, count, queue=None):
+        raise NotImplementedError("Subclasses must implement this method.")
+
     @abstractmethod
     async def len(self):
         raise NotImplementedError("Subclasses must implement this method.")
@@ -42,3 +50,23 @@ class MQueue(ABC):
     @abstractmethod
     async def exists(self, key):
         raise NotImplementedError("Subclasses must implement this method.")
+
+    @abstractmethod
+    async def incr(self, key):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    @abstractmethod
+    async def delete(self, *keys):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    @abstractmethod
+    async def range(self, queue, start=0, end=-1):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    @abstractmethod
+    async def schedule(self, item, at: float, queue):
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    @abstractmethod
+    async def pop_due(self, until: float, count, queue):
+        raise NotImplementedError("Subclasses must implement this method.")
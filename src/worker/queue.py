@@ -1,4 +1,9 @@
+import asyncio
 import json
+import threading
+import time
+from collections import deque
+
 import redis
 
 from . import MQueue
@@ -8,8 +13,9 @@ class RedisQueue(MQueue):
     async def expired(self, key, ttl):
         self.client.expire(key, ttl)
 
-    def __init__(self, host='localhost', port=6379, db=0):
+    def __init__(self, host='localhost', port=6379, db=0, poll_interval=0.1):
         self.client = redis.StrictRedis(host=host, port=port, db=db)
+        self.poll_interval = poll_interval
 
     async def push(self, item, queue=None):
         if queue is not None:
@@ -18,16 +24,37 @@ class RedisQueue(MQueue):
             self.client.rpush('queue', json.dumps(item))
 
     async def pop(self, queue=None):
+        # the client is synchronous, a BLPOP would block every worker on the event loop
         if queue is not None:
-            item = self.client.blpop([queue], timeout=1)
+            item = self.client.lpop(queue)
         else:
-            item = self.client.blpop(['queue'], timeout=1)
+            item = self.client.lpop('queue')
 
         if item is not None:
-            return json.loads(item[1])
+            return json.loads(item)
 
+        await asyncio.sleep(self.poll_interval)
         return item
 
+    async def push_many(self, items, queue=None):
+        if not items:
+            return
+
+        queue = queue if queue is not None else 'queue'
+        self.client.rpush(queue, *[json.dumps(item) for item in items])
+
+    async def pop_many(self, count, queue=None):
+        queue = queue if queue is not None else 'queue'
+
+        # LPOP with a count needs Redis >= 6.2
+        items = self.client.lpop(queue, count)
+        if items:
+            return [json.loads(item) for item in items]
+
+        # nothing queued, yield to the other workers instead of spinning or blocking the loop
+        await asyncio.sleep(self.poll_interval)
+        return []
+
     async def len(self, queue=None):
         if queue is not None:
             return self.client.llen(queue)
@@ -47,8 +74,169 @@ class RedisQueue(MQueue):
         return self.client.exists(key)
 
     async def decr(self, key):
-        await self.client.decr(key)
+        return self.client.decr(key)
+
+    async def incr(self, key):
+        return self.client.incr(key)
+
+    async def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    async def range(self, queue, start=0, end=-1):
+        return [json.loads(item) for item in self.client.lrange(queue, start, end)]
+
+    async def schedule(self, item, at, queue):
+        # sorted set scored by the unix time the item becomes due
+        self.client.zadd(queue, {json.dumps(item): at})
+
+    async def pop_due(self, until, count, queue):
+        members = self.client.zrangebyscore(queue, '-inf', until, start=0, num=count)
+
+        items = []
+        for member in members:
+            # only the consumer whose ZREM succeeds owns the item
+            if self.client.zrem(queue, member):
+                items.append(json.loads(member))
+
+        return items
 
     async def publish(self, channel, message):
         await self.client.publish(channel, message)
 
+
+class InMemoryQueue(MQueue):
+    """
+    Process local MQueue for single-node deployments and tests without Redis.
+
+    Lists, keys and sorted sets live in plain dicts behind a lock, since the
+    Flask request threads push from their own event loops. Blocking pops wait
+    on an asyncio.Event that pushes wake up thread-safely.
+    """
+
+    def __init__(self, timeout=1):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.lists = {}
+        self.keys = {}
+        self.sorted_sets = {}
+        self.waiters = set()
+
+    def _list(self, queue):
+        return self.lists.setdefault(queue if queue is not None else 'queue', deque())
+
+    def _notify(self):
+        for loop, event in self.waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _value(self, key):
+        value, expires_at = self.keys.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.keys[key]
+            return None
+
+        return value
+
+    async def push(self, item, queue=None):
+        await self.push_many([item], queue)
+
+    async def push_many(self, items, queue=None):
+        if not items:
+            return
+
+        with self.lock:
+            self._list(queue).extend(json.dumps(item) for item in items)
+            self._notify()
+
+    async def pop(self, queue=None):
+        items = await self.pop_many(1, queue)
+        return items[0] if items else None
+
+    async def pop_many(self, count, queue=None):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            event = asyncio.Event()
+            waiter = (asyncio.get_running_loop(), event)
+
+            with self.lock:
+                items = self._list(queue)
+                if items:
+                    return [json.loads(items.popleft()) for _ in range(min(count, len(items)))]
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self.waiters.add(waiter)
+
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self.lock:
+                    self.waiters.discard(waiter)
+
+    async def len(self, queue=None):
+        with self.lock:
+            return len(self._list(queue))
+
+    async def range(self, queue, start=0, end=-1):
+        with self.lock:
+            items = list(self._list(queue))
+
+        # same inclusive end semantics as LRANGE
+        end = len(items) if end == -1 else end + 1
+        return [json.loads(item) for item in items[start:end]]
+
+    async def set(self, key, value, ttl=None):
+        if isinstance(value, dict):
+            value = json.dumps(value)
+
+        with self.lock:
+            self.keys[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    async def expired(self, key, ttl):
+        with self.lock:
+            value = self._value(key)
+            if value is not None:
+                self.keys[key] = (value, time.monotonic() + ttl)
+
+    async def get(self, key):
+        with self.lock:
+            return self._value(key)
+
+    async def exists(self, key):
+        with self.lock:
+            return int(self._value(key) is not None)
+
+    async def incr(self, key):
+        with self.lock:
+            value = int(self._value(key) or 0) + 1
+            _, expires_at = self.keys.get(key, (None, None))
+            self.keys[key] = (value, expires_at)
+            return value
+
+    async def decr(self, key):
+        with self.lock:
+            value = int(self._value(key) or 0) - 1
+            _, expires_at = self.keys.get(key, (None, None))
+            self.keys[key] = (value, expires_at)
+            return value
+
+    async def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.keys.pop(key, None)
+
+    async def schedule(self, item, at, queue):
+        with self.lock:
+            self.sorted_sets.setdefault(queue, {})[json.dumps(item)] = at
+
+    async def pop_due(self, until, count, queue):
+        with self.lock:
+            scores = self.sorted_sets.get(queue, {})
+            due = sorted((score, member) for member, score in scores.items() if score <= until)[:count]
+            for _, member in due:
+                del scores[member]
+
+        return [json.loads(member) for _, member in due]
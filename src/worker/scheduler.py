@@ -0,0 +1,73 @@
+from collections import OrderedDict, deque
+
+
+class FairScheduler:
+    """
+    Pending URLs grouped into one sub-queue per request.
+
+    `pop` first serves requests with at most `boost_remaining` URLs left, so a
+    nearly finished request is not held back by a straggler, then takes one
+    URL per request in round-robin order. A URL wanted by several requests is
+    queued once per request but handed out only once. Items without a request
+    (background refreshes) are never boosted.
+    """
+
+    def __init__(self, boost_remaining=2):
+        self.boost_remaining = boost_remaining
+        self.queues = OrderedDict()
+        self.remaining = {}
+        self.owners = {}
+
+    def __len__(self):
+        return len(self.owners)
+
+    def __contains__(self, url):
+        return url in self.owners
+
+    def add(self, url, key=None):
+        owners = self.owners.setdefault(url, set())
+        if key in owners:
+            return
+
+        owners.add(key)
+        self.queues.setdefault(key, deque()).append(url)
+        self.remaining[key] = self.remaining.get(key, 0) + 1
+
+    def pop(self, n):
+        items = []
+
+        boosted = sorted(
+            (remaining, str(key), key) for key, remaining in self.remaining.items()
+            if key is not None and remaining <= self.boost_remaining
+        )
+        for _, _, key in boosted:
+            while len(items) < n and self.take(key, items):
+                pass
+
+        while len(items) < n and self.queues:
+            key = next(iter(self.queues))
+            self.take(key, items)
+            if key in self.queues:
+                self.queues.move_to_end(key)
+
+        return items
+
+    def take(self, key, items):
+        queue = self.queues.get(key)
+        while queue:
+            url = queue.popleft()
+            # skip urls already handed out through another request
+            if url in self.owners:
+                for owner in self.owners.pop(url):
+                    self.remaining[owner] -= 1
+                    if self.remaining[owner] == 0:
+                        del self.remaining[owner]
+                        del self.queues[owner]
+                items.append(url)
+                return True
+
+        if key in self.queues:
+            del self.queues[key]
+            self.remaining.pop(key, None)
+
+        return False
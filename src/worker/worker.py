@@ -1,99 +1,346 @@
 import asyncio
 import logging
 import os
+import time
 from datetime import datetime, timedelta
 
 from flask.ctx import AppContext
 from flask_mail import Message, Mail
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import distinct
+from sqlalchemy import distinct, select, or_, text
 
+from src.app_services.scrape import REVIEW_TTL
 from src.datastore.models import Review, Progress, ProgressStatus, Request
-from src.datastore.utils import bulk_insert_or_update
-from src.scraper import IScraper
+from src.datastore.utils import bulk_insert_or_update, delete_requests
+from src.scraper import IScraper, TransientScrapeError
 from src.writer import OutputWriter
 from . import MQueue, Worker
-from src.utils import send_email_with_attachment
+from src.utils import send_email_with_attachment, RollingPercentile
+from .scheduler import FairScheduler
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 
 class ScrapeWorker(Worker):
-    def __init__(self, queue: MQueue, scraper: IScraper, db: SQLAlchemy):
+    def __init__(self, queue: MQueue, scraper: IScraper, db: SQLAlchemy, batch_size=50,
+                 max_attempts=5, base_delay=timedelta(seconds=30), max_delay=timedelta(hours=1),
+                 priority_interval=timedelta(seconds=5), max_pending=10000):
         self.queue = queue
         self.scraper = scraper
         self.db = db
-        self.pending_urls = set()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.priority_interval = priority_interval
+        self.max_pending = max_pending
+        self.pending_urls = FairScheduler()
+        # urls waiting in the 'retry' sorted set, left to the RetryWorker
+        self.retrying = set()
         self.last_run = set()
         self.last_gather = datetime.now()
+        self.last_priority = datetime.min
 
     async def listen(self, context):
         with context:
             while True:
                 try:
-                    item = await self.queue.pop('scrape')
-                    await self.on_data(item)
+                    items = await self.drain()
+                    await self.on_data(items)
                 except Exception as e:
                     logger.debug(e)
 
                 await asyncio.sleep(0)
 
-    async def on_data(self, item):
-        if item is not None:
-            logger.info(f'Add scrape task: {item}')
-            # add new url into task queue
-            self.add_task(item)
+    async def drain(self):
+        # take everything queued (up to max_pending) so the FairScheduler sees the whole
+        # backlog; popping one batch at a time would just replay the FIFO order
+        items = []
+        while len(self.pending_urls) + len(items) < self.max_pending:
+            count = min(self.batch_size, self.max_pending - len(self.pending_urls) - len(items))
+            chunk = await self.queue.pop_many(count, 'scrape')
+            items.extend(chunk)
+            if len(chunk) < count:
+                break
 
-        # a priority mechanism
-        for url in self.priority_item():
-            if url not in self.pending_urls:
-                self.pending_urls.add(url)
+        return items
+
+    async def on_data(self, items):
+        if items:
+            logger.info(f'Add {len(items)} scrape tasks')
+            # add new urls into task queue
+            for item in items:
+                self.add_task(item)
+
+        # a priority mechanism, the query is throttled as a chunk can be drained every iteration
+        if datetime.now() - self.last_priority > self.priority_interval:
+            self.last_priority = datetime.now()
+            for url, request_id in self.priority_item():
+                if url not in self.retrying:
+                    self.pending_urls.add(url, request_id)
         # do scrape task
         await self.do_task()
         await asyncio.sleep(0)
 
     async def start(self, item):
-        # item should be {'url': url, 'request_id': 0}
+        # item should be {'url': url, 'request_id': request_id}
         await self.queue.push(item, 'scrape')
 
+    async def start_many(self, items):
+        await self.queue.push_many(items, 'scrape')
+
     def add_task(self, item: dict):
         url = item.get('url', '')
-        if url:
-            self.pending_urls.add(url)
+        if url and url not in self.retrying:
+            self.pending_urls.add(url, item.get('request_id'))
 
     def pop_items(self, n):
-        items = set()
-        for _ in range(min(len(self.pending_urls), n)):
-            item = self.pending_urls.pop()
-            items.add(item)
-        return items
+        return self.pending_urls.pop(n)
 
     def priority_item(self):
-        priority_task = self.db.session.query(Progress).filter(
+        priority_task = self.db.session.query(Review.url, Progress.request_id).join(
+            Progress, Progress.review_id == Review.id
+        ).filter(
             Progress.status == ProgressStatus.PENDING,
-            datetime.now() - Progress.created_at > timedelta(minutes=5)
+            Progress.created_at < datetime.now() - timedelta(minutes=5)
         )
 
-        return set([record.url for record in priority_task])
+        return set([(url, request_id) for url, request_id in priority_task])
 
     async def do_task(self):
-        cond1 = len(self.pending_urls) >= 50
+        cond1 = len(self.pending_urls) >= self.batch_size
         cond2 = (datetime.now() - self.last_gather > timedelta(seconds=10)) and len(self.pending_urls) > 0
         if cond1 or cond2:
             self.last_gather = datetime.now()
-            urls_to_process = self.pop_items(50)
+            urls_to_process = self.pop_items(self.batch_size)
             tasks = [self.scraper.scrape(url) for url in urls_to_process]
-            results = await asyncio.gather(*tasks)
-            bulk_insert_or_update(self.db, list(results))
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            await self.save_results(urls_to_process, results)
+
+    async def save_results(self, urls, results):
+        failed = [url for url, result in zip(urls, results) if not isinstance(result, dict)]
+        waiting = self.waiting_urls(failed) if failed else set()
+
+        reviews = []
+        # urls whose failure history is reset
+        cleared = []
+        for url, result in zip(urls, results):
+            if isinstance(result, dict):
+                reviews.append(result)
+                cleared.append(url)
+                self.retrying.discard(url)
+            elif url not in waiting:
+                # a background refresh, or a retry whose requests are gone: keep the current
+                # review and forget the url, otherwise add_task would skip it from now on
+                logger.info(f'{url} -- scrape failed with nobody waiting, keeping the current review: {result}')
+                cleared.append(url)
+                self.retrying.discard(url)
+            elif isinstance(result, TransientScrapeError) and await self.retry_later(url, result):
+                continue
+            else:
+                await self.dead_letter(url, result)
+                reviews.append({'url': url, 'location': 'Error', 'reviewer': 'Error', 'content': 'Error'})
+
+        # a success resets the failure history, wherever the url was scraped
+        await self.queue.delete(*[self.attempts_key(url) for url in cleared])
+
+        if not reviews:
+            return
+
+        bulk_insert_or_update(self.db, reviews)
+
+        # Perform the update operation
+        finished = [review['url'] for review in reviews]
+        review_ids = select(Review.id).where(Review.url.in_(finished))
+        self.db.session.query(Progress).filter(
+            Progress.review_id.in_(review_ids),
+            Progress.status == ProgressStatus.PENDING
+        ).update({Progress.status: ProgressStatus.NOTIFYING}, synchronize_session=False)
+
+        self.db.session.commit()
+
+    def waiting_urls(self, urls):
+        query = self.db.session.query(distinct(Review.url)).join(Progress, Progress.review_id == Review.id).filter(
+            Review.url.in_(urls),
+            Progress.status == ProgressStatus.PENDING
+        )
+
+        return set(url for url, in query)
+
+    @staticmethod
+    def attempts_key(url):
+        return f'retry:attempts:{url}'
+
+    async def retry_later(self, url, error):
+        key = self.attempts_key(url)
+        attempts = await self.queue.incr(key)
+        # remember failures for a day, so a resubmitted url does not start over
+        await self.queue.expired(key, 86400)
+        # max_attempts counts scrapes, the first one included
+        if attempts >= self.max_attempts:
+            self.retrying.discard(url)
+            return False
+
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        await self.queue.schedule(url, time.time() + delay.total_seconds(), 'retry')
+        self.retrying.add(url)
+        logger.info(f'{url} -- attempt {attempts}/{self.max_attempts} failed, retry in {delay.total_seconds():.0f}s: {error}')
+        return True
+
+    async def dead_letter(self, url, error):
+        self.retrying.discard(url)
+        kind = 'transient' if isinstance(error, TransientScrapeError) else 'permanent'
+        item = {'url': url, 'kind': kind, 'error': str(error), 'failed_at': datetime.now().isoformat()}
+        await self.queue.push(item, 'dead_letter')
+        logger.warning(f'{url} -- dead-lettered ({kind}): {error}')
+
+
+class RetryWorker(Worker):
+    """
+    Re-scrapes URLs from the ScrapeWorker's 'retry' sorted set once their
+    backoff has elapsed. It runs its own loop with its own small concurrency,
+    so retries never take slots from fresh submissions.
+    """
+
+    def __init__(self, worker: ScrapeWorker, concurrency=5, interval=1):
+        self.worker = worker
+        self.concurrency = concurrency
+        self.interval = interval
 
-            # Perform the update operation
-            updated_record = self.db.session.query(Progress).filter(Progress.url.in_(urls_to_process)).all()
+    async def listen(self, context: AppContext):
+        with context:
+            while True:
+                try:
+                    await self.retry()
+                except Exception as e:
+                    self.worker.db.session.rollback()
+                    logger.debug(e)
 
-            for record in updated_record:
-                record.status = ProgressStatus.NOTIFYING
+                await asyncio.sleep(self.interval)
 
-            self.db.session.commit()
+    async def start(self, item: dict):
+        await self.worker.queue.schedule(item['url'], time.time(), 'retry')
+
+    async def retry(self):
+        urls = await self.worker.queue.pop_due(time.time(), self.concurrency, 'retry')
+        if not urls:
+            return
+
+        results = await asyncio.gather(*[self.worker.scraper.scrape(url) for url in urls], return_exceptions=True)
+        try:
+            await self.worker.save_results(urls, results)
+        except Exception as e:
+            # pop_due already took the urls out of the sorted set, put them back
+            # instead of leaving them in `retrying` with nothing left to retry them
+            self.worker.db.session.rollback()
+            logger.warning(f'Saving {len(urls)} retries failed, rescheduling: {e}')
+            try:
+                at = time.time() + self.worker.base_delay.total_seconds()
+                for url in urls:
+                    await self.worker.queue.schedule(url, at, 'retry')
+                self.worker.retrying.update(urls)
+            except Exception:
+                # the queue is unavailable too, let priority_item pick the urls up again
+                self.worker.retrying.difference_update(urls)
+                raise
+
+
+class RefreshScheduler(Worker):
+    """
+    Re-scrapes frequently requested URLs shortly before their review goes stale.
+
+    Popularity is an exponentially decayed hit count per URL. Refreshes are
+    handed to the ScrapeWorker only while it has room left in its next batch,
+    and never faster than `budget` fetches per minute.
+    """
+
+    def __init__(self, worker: ScrapeWorker, db: SQLAlchemy, budget=30, lead_time=timedelta(minutes=5),
+                 half_life=timedelta(hours=1), min_hits=2):
+        self.worker = worker
+        self.db = db
+        self.budget = budget
+        self.lead_time = lead_time
+        self.half_life = half_life.total_seconds()
+        self.min_hits = min_hits
+        self.hits = {}
+        self.queued = {}
+        self.tokens = float(budget)
+        self.last_refill = datetime.now()
+
+    async def listen(self, context: AppContext):
+        with context:
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.db.session.rollback()
+                    logger.debug(e)
+
+                await asyncio.sleep(1)
+
+    async def start(self, item: dict):
+        self.hit(item.get('url', ''))
+
+    def hit(self, url):
+        if not url:
+            return
+
+        now = datetime.now()
+        score, last_seen = self.hits.get(url, (0.0, now))
+        self.hits[url] = (self.decay(score, now - last_seen) + 1, now)
+
+    def decay(self, score, elapsed: timedelta):
+        return score * 0.5 ** (elapsed.total_seconds() / self.half_life)
+
+    def hot_urls(self, now: datetime, limit=500):
+        scores = []
+        for url, (score, last_seen) in list(self.hits.items()):
+            score = self.decay(score, now - last_seen)
+            if score < 0.01:
+                # forget URLs nobody has asked for in a long while
+                self.hits.pop(url, None)
+            elif score >= self.min_hits:
+                scores.append((score, url))
+
+        scores.sort(reverse=True)
+        return [url for _, url in scores[:limit]]
+
+    def refill(self, now: datetime):
+        elapsed = (now - self.last_refill).total_seconds()
+        self.tokens = min(float(self.budget), self.tokens + elapsed * self.budget / 60)
+        self.last_refill = now
+
+    def refresh(self):
+        now = datetime.now()
+        self.refill(now)
+
+        for url, queued_at in list(self.queued.items()):
+            if now - queued_at > self.lead_time:
+                del self.queued[url]
+
+        spare = self.worker.batch_size - len(self.worker.pending_urls)
+        capacity = min(int(self.tokens), spare)
+        if capacity <= 0:
+            return
+
+        hot = [url for url in self.hot_urls(now) if url not in self.queued and url not in self.worker.pending_urls]
+        if not hot:
+            return
+
+        stale_at = now - REVIEW_TTL + self.lead_time
+        due = set(url for url, in self.db.session.query(Review.url).filter(
+            Review.url.in_(hot),
+            Review.content.isnot(None),
+            Review.updated_at < stale_at
+        ))
+        self.db.session.commit()
+
+        for url in [url for url in hot if url in due][:capacity]:
+            self.worker.add_task({'url': url})
+            self.queued[url] = now
+            self.tokens -= 1
+            logger.info(f'Refresh hot review: {url}')
 
 
 class Publisher(Worker):
@@ -102,6 +349,7 @@ class Publisher(Worker):
         self.writer = writer
         self.db = db
         self.sender = sender
+        self.latency = RollingPercentile()
 
     async def listen(self, context: AppContext):
         with context:
@@ -125,20 +373,23 @@ class Publisher(Worker):
 
     def notify(self):
         for request_id in self.get_notify():
-            progress = self.db.session.query(Progress).filter_by(request_id=request_id).all()
+            # only the columns of ix_progress_request_id_status, so the index covers the query
+            progress = self.db.session.query(Progress.status, Progress.review_id).filter(
+                Progress.request_id == request_id).all()
 
-            pending = any(record.status == ProgressStatus.PENDING for record in progress)
+            pending = any(status == ProgressStatus.PENDING for status, _ in progress)
             if not pending:
                 if self.writer is not None:
-                    urls = [record.url for record in progress]
-                    reviews = self.db.session.query(Review).filter(Review.url.in_(urls)).all()
+                    review_ids = [review_id for _, review_id in progress]
+                    reviews = self.db.session.query(Review).filter(Review.id.in_(review_ids)).all()
                     file_path = f'./temp/{request_id}.csv'
                     self.writer.write(file_path, reviews)
                     logger.info(f"{request_id} -- Output written to {file_path}")
 
-            for record in progress:
-                if record.status == ProgressStatus.NOTIFYING:
-                    record.status = ProgressStatus.DONE
+            self.db.session.query(Progress).filter(
+                Progress.request_id == request_id,
+                Progress.status == ProgressStatus.NOTIFYING
+            ).update({Progress.status: ProgressStatus.DONE}, synchronize_session=False)
 
             self.db.session.commit()
 
@@ -154,7 +405,10 @@ class Publisher(Worker):
             attachment = f'./temp/{request_id}.csv'
             send_email_with_attachment(self.sender, request.email, subject, boby, attachment)
 
-            logger.info(f"{request_id} -- Email sent: {request.email}")
+            elapsed = (datetime.now() - request.created_at).total_seconds()
+            self.latency.add(elapsed)
+            logger.info(f"{request_id} -- Email sent: {request.email} after {elapsed:.1f}s "
+                        f"(p50 {self.latency.percentile(50):.1f}s, p95 {self.latency.percentile(95):.1f}s)")
 
     def clean(self, request_id):
         try:
@@ -163,11 +417,163 @@ class Publisher(Worker):
                 os.remove(attachment_path)
                 logger.info(f"{request_id} -- Deleted file")
 
-            request = Request.query.get_or_404(request_id)
-            self.db.session.delete(request)
-            self.db.session.commit()
+            delete_requests(self.db, [request_id])
 
             logger.info(f"{request_id} -- Request clear")
         except Exception as e:
             self.db.session.rollback()
             logger.debug(f'{request_id} -- Request clear Error: {str(e)}')
+
+
+class RetentionWorker(Worker):
+    """
+    Periodically reclaims space: finished or abandoned requests, reviews nobody
+    references any more, leftover attachments in the temp directory, followed
+    by an incremental VACUUM and a bounded ANALYZE.
+
+    Every DELETE is limited to `chunk_size` rows and committed on its own, with
+    a yield to the event loop in between, so the other workers never wait on
+    a long write transaction.
+    """
+
+    def __init__(self, db: SQLAlchemy, interval=timedelta(hours=1), chunk_size=500,
+                 review_ttl=timedelta(days=30), request_ttl=timedelta(days=7), temp_ttl=timedelta(hours=24),
+                 temp_dir='./temp', vacuum_pages=1000):
+        self.db = db
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.review_ttl = review_ttl
+        self.request_ttl = request_ttl
+        self.temp_ttl = temp_ttl
+        self.temp_dir = temp_dir
+        self.vacuum_pages = vacuum_pages
+
+    async def listen(self, context: AppContext):
+        with context:
+            while True:
+                try:
+                    await self.run()
+                except Exception as e:
+                    self.db.session.rollback()
+                    logger.debug(e)
+
+                await asyncio.sleep(self.interval.total_seconds())
+
+    async def start(self, item: dict):
+        pass
+
+    async def run(self):
+        requests = await self.purge_requests()
+        orphans = await self.purge_orphaned_progress()
+        reviews = await self.expire_reviews()
+        files = self.sweep_temp()
+        self.vacuum()
+        logger.info(f'Retention: {requests} requests, {orphans} orphaned progress rows, {reviews} reviews, '
+                    f'{files} temp files removed')
+
+    async def purge_requests(self):
+        now = datetime.now()
+        unfinished = select(Progress.id).where(
+            Progress.request_id == Request.id,
+            Progress.status.in_([ProgressStatus.PENDING, ProgressStatus.NOTIFYING])
+        ).exists()
+        # the grace period keeps requests that are still being submitted
+        query = self.db.session.query(Request.id).filter(or_(
+            Request.created_at < now - self.request_ttl,
+            (Request.created_at < now - timedelta(hours=1)) & ~unfinished
+        ))
+
+        total = 0
+        while True:
+            request_ids = [request_id for request_id, in query.limit(self.chunk_size)]
+            total += delete_requests(self.db, request_ids)
+            for request_id in request_ids:
+                self.remove_file(os.path.join(self.temp_dir, f'{request_id}.csv'))
+
+            if len(request_ids) < self.chunk_size:
+                return total
+
+            await asyncio.sleep(0)
+
+    async def purge_orphaned_progress(self):
+        # left behind by deletes that relied on the ORM cascade, SQLite does not enforce the FK.
+        # Find them with a read over the request_id index, then delete per chunk of request ids.
+        request_exists = select(Request.id).where(Request.id == Progress.request_id).exists()
+        request_ids = [request_id for request_id, in
+                       self.db.session.query(distinct(Progress.request_id)).filter(~request_exists)]
+        self.db.session.commit()
+
+        total = 0
+        for i in range(0, len(request_ids), self.chunk_size):
+            chunk = request_ids[i:i + self.chunk_size]
+            total += self.db.session.query(Progress).filter(Progress.request_id.in_(chunk)).delete(
+                synchronize_session=False)
+            self.db.session.commit()
+
+            await asyncio.sleep(0)
+
+        return total
+
+    async def expire_reviews(self):
+        referenced = select(Progress.id).where(Progress.review_id == Review.id).exists()
+        expired = select(Review.id).where(
+            Review.updated_at < datetime.now() - self.review_ttl,
+            ~referenced
+        ).limit(self.chunk_size)
+
+        total = 0
+        while True:
+            deleted = self.db.session.query(Review).filter(Review.id.in_(expired)).delete(synchronize_session=False)
+            self.db.session.commit()
+            total += deleted
+
+            if deleted < self.chunk_size:
+                return total
+
+            await asyncio.sleep(0)
+
+    def sweep_temp(self):
+        if not os.path.isdir(self.temp_dir):
+            return 0
+
+        cutoff = (datetime.now() - self.temp_ttl).timestamp()
+        files = {}
+        for entry in os.scandir(self.temp_dir):
+            if entry.is_file() and entry.name.endswith('.csv'):
+                files[entry.name[:-len('.csv')]] = entry
+
+        existing = set()
+        names = list(files)
+        for i in range(0, len(names), self.chunk_size):
+            chunk = names[i:i + self.chunk_size]
+            existing.update(request_id for request_id, in
+                            self.db.session.query(Request.id).filter(Request.id.in_(chunk)))
+        self.db.session.commit()
+
+        removed = 0
+        for request_id, entry in files.items():
+            if request_id not in existing or entry.stat().st_mtime < cutoff:
+                removed += self.remove_file(entry.path)
+
+        return removed
+
+    def vacuum(self):
+        if self.db.engine.dialect.name != 'sqlite':
+            return
+
+        with self.db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            # a plain execute() only steps the pragma once, freeing a single page;
+            # executescript runs it to completion
+            conn.connection.driver_connection.executescript(
+                f'PRAGMA incremental_vacuum({int(self.vacuum_pages)});'
+            )
+            conn.execute(text('PRAGMA analysis_limit=1000'))
+            conn.execute(text('ANALYZE'))
+
+    @staticmethod
+    def remove_file(path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
@@ -5,3 +5,6 @@ class OutputWriter(ABC):
     @abstractmethod
     def write(self, file_path: str, data):
         raise NotImplementedError("Subclasses must implement this method.")
+
+    def append(self, file_path: str, data):
+        raise NotImplementedError("Subclasses must implement this method.")
@@ -4,10 +4,28 @@ from flask_sqlalchemy.model import Model
 
 from src.datastore.utils import model_to_list
 
+REVIEW_FIELDS = ('url', 'location', 'reviewer', 'content')
+
+
+def review_to_list(item):
+    # scrapers return plain dicts, the datastore returns Review models
+    if isinstance(item, dict):
+        return [item.get(field) for field in REVIEW_FIELDS]
+
+    return model_to_list(item, *REVIEW_FIELDS)
+
 
 def convert_data_to_csv(func):
-    def wrapper(self, file_path: str, data: Iterable[Model]):
-        converted_data = [model_to_list(item, 'url', 'location', 'reviewer', 'content') for item in data]
+    def wrapper(self, file_path: str, data: Iterable[Model | dict]):
+        converted_data = [review_to_list(item) for item in data]
+        return func(self, file_path, converted_data)
+
+    return wrapper
+
+
+def convert_data_to_dict(func):
+    def wrapper(self, file_path: str, data: Iterable[Model | dict]):
+        converted_data = [dict(zip(REVIEW_FIELDS, review_to_list(item))) for item in data]
         return func(self, file_path, converted_data)
 
     return wrapper
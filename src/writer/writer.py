@@ -1,19 +1,55 @@
 import csv
+import json
 import os
 from typing import Iterable
 
 from . import OutputWriter
-from .utils import convert_data_to_csv
+from .utils import convert_data_to_csv, convert_data_to_dict
+
+CSV_HEADER = ['URL', 'Location', 'Reviewer', 'Content']
+
+
+def ensure_directory(file_path: str):
+    directory = os.path.dirname(file_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
 
 
 class CSVWriter(OutputWriter):
     @convert_data_to_csv
     def write(self, file_path: str, data: Iterable):
-        directory = os.path.dirname(file_path)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory)
+        ensure_directory(file_path)
 
         with open(file_path, 'w', newline='', encoding='utf-8-sig') as output_csv:
             csv_writer = csv.writer(output_csv)
-            csv_writer.writerow(['URL', 'Location', 'Reviewer', 'Content'])  # Write header to CSV
+            csv_writer.writerow(CSV_HEADER)  # Write header to CSV
+            csv_writer.writerows(data)
+
+    @convert_data_to_csv
+    def append(self, file_path: str, data: Iterable):
+        ensure_directory(file_path)
+        new_file = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+
+        with open(file_path, 'a', newline='', encoding='utf-8-sig') as output_csv:
+            csv_writer = csv.writer(output_csv)
+            if new_file:
+                csv_writer.writerow(CSV_HEADER)
             csv_writer.writerows(data)
+
+
+class JSONLWriter(OutputWriter):
+    @convert_data_to_dict
+    def write(self, file_path: str, data: Iterable):
+        ensure_directory(file_path)
+
+        with open(file_path, 'w', encoding='utf-8') as output_jsonl:
+            for item in data:
+                output_jsonl.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+    @convert_data_to_dict
+    def append(self, file_path: str, data: Iterable):
+        ensure_directory(file_path)
+
+        with open(file_path, 'a', encoding='utf-8') as output_jsonl:
+            for item in data:
+                output_jsonl.write(json.dumps(item, ensure_ascii=False) + '\n')
@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+import pytest
+
+# src.config reads the environment at import time
+os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tempfile.mkdtemp()}/reviews.db'
+
+from src import create_app  # noqa: E402
+from src.datastore import db  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def database(app):
+    with app.app_context():
+        yield db
+
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
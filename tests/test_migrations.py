@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+from flask import Flask
+from sqlalchemy import inspect
+
+from src.datastore import db
+from src.datastore.migrations import migrate
+from src.datastore.models import Review, Progress
+
+# the url-keyed schema as the baseline models created it
+OLD_SCHEMA = """
+CREATE TABLE review (
+    url VARCHAR NOT NULL, updated_at DATETIME, location VARCHAR, reviewer VARCHAR, content TEXT,
+    PRIMARY KEY (url)
+);
+CREATE TABLE request (
+    id VARCHAR NOT NULL, email VARCHAR NOT NULL, created_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE TABLE progress (
+    id INTEGER NOT NULL, request_id INTEGER NOT NULL, url INTEGER NOT NULL, status INTEGER, created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(request_id) REFERENCES request (id),
+    FOREIGN KEY(url) REFERENCES review (url),
+    FOREIGN KEY(request_id) REFERENCES request (id) ON DELETE CASCADE
+);
+INSERT INTO request VALUES ('live', 'user@example.com', '2024-01-01 10:00:00.000000');
+INSERT INTO review VALUES ('https://a', '2024-01-01 09:00:00.000000', 'Hanoi', 'Alice', 'good');
+INSERT INTO review VALUES ('https://b', '2024-01-01 09:30:00.000000', 'Hue', 'Bob', 'bad');
+-- scraped url of a live request
+INSERT INTO progress VALUES (1, 'live', 'https://a', 1, '2024-01-01 10:00:00.000000');
+-- never scraped url of a live request, needs a placeholder review
+INSERT INTO progress VALUES (2, 'live', 'https://c', 2, '2024-01-01 10:00:01.000000');
+-- orphans of a deleted request
+INSERT INTO progress VALUES (3, 'gone', 'https://a', 1, '2024-01-01 08:00:00.000000');
+INSERT INTO progress VALUES (4, 'gone', 'https://d', 2, '2024-01-01 08:00:00.000000');
+"""
+
+
+@pytest.fixture
+def legacy_app(tmp_path):
+    path = tmp_path / 'legacy.db'
+    with sqlite3.connect(path) as conn:
+        conn.executescript(OLD_SCHEMA)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+
+    with app.app_context():
+        yield app
+        db.engine.dispose()
+
+
+def rows(sql):
+    with db.engine.connect() as conn:
+        return [tuple(row) for row in conn.exec_driver_sql(sql)]
+
+
+def snapshot():
+    return (
+        rows("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_stat%' ORDER BY name"),
+        rows('SELECT * FROM review ORDER BY id'),
+        rows('SELECT * FROM progress ORDER BY id'),
+        rows('SELECT * FROM request ORDER BY id'),
+    )
+
+
+def test_migrate_upgrades_url_keyed_schema(legacy_app):
+    migrate(db)
+
+    reviews = {row[1]: row for row in rows('SELECT id, url, updated_at, content FROM review')}
+    assert set(reviews) == {'https://a', 'https://b', 'https://c'}
+    assert reviews['https://a'][3] == 'good'
+    # placeholder for the url that was never scraped, none for the orphan's url
+    assert reviews['https://c'][2:] == ('2024-01-01 10:00:01.000000', None)
+
+    assert rows('SELECT p.id, p.request_id, r.url, p.status FROM progress p '
+                'JOIN review r ON r.id = p.review_id ORDER BY p.id') == [
+        (1, 'live', 'https://a', 1),
+        (2, 'live', 'https://c', 2),
+    ]
+
+    inspector = inspect(db.engine)
+    assert 'url' not in [column['name'] for column in inspector.get_columns('progress')]
+    assert not {'review_old', 'progress_old'} & set(inspector.get_table_names())
+    for table in [Review.__table__, Progress.__table__]:
+        existing = {index['name']: index['column_names'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            assert existing[index.name] == [column.name for column in index.columns]
+
+    assert rows('PRAGMA auto_vacuum') == [(2,)]
+
+
+def test_migrate_is_a_no_op_on_a_migrated_database(legacy_app):
+    migrate(db)
+    migrated = snapshot()
+
+    migrate(db)
+    assert snapshot() == migrated
@@ -0,0 +1,91 @@
+import asyncio
+
+from src.datastore import db
+from src.scraper import IScraper
+from src.worker.queue import InMemoryQueue
+from src.worker.worker import ScrapeWorker
+
+
+class FakeScraper(IScraper):
+    async def scrape(self, url):
+        return {'url': url, 'location': 'Location', 'reviewer': 'Reviewer', 'content': 'Content'}
+
+
+class CountingQueue(InMemoryQueue):
+    def __init__(self):
+        super().__init__(timeout=0.01)
+        self.calls = 0
+
+    async def pop(self, queue=None):
+        # InMemoryQueue.pop goes through pop_many, count it as the single call it stands for
+        self.calls += 1
+        items = await super().pop_many(1, queue)
+        return items[0] if items else None
+
+    async def pop_many(self, count, queue=None):
+        self.calls += 1
+        return await super().pop_many(count, queue)
+
+
+def test_push_many_pop_many_keeps_order():
+    async def run():
+        queue = InMemoryQueue(timeout=0.01)
+        await queue.push_many([{'url': f'u{i}'} for i in range(5)], 'scrape')
+
+        assert await queue.len('scrape') == 5
+        assert await queue.pop_many(3, 'scrape') == [{'url': 'u0'}, {'url': 'u1'}, {'url': 'u2'}]
+        assert await queue.pop_many(3, 'scrape') == [{'url': 'u3'}, {'url': 'u4'}]
+        assert await queue.pop_many(3, 'scrape') == []
+        assert await queue.pop('scrape') is None
+
+    asyncio.run(run())
+
+
+def test_pop_many_wakes_up_on_push():
+    async def run():
+        queue = InMemoryQueue(timeout=5)
+        loop = asyncio.get_running_loop()
+        # Flask request threads push from their own event loop
+        loop.call_later(0.05, lambda: loop.run_in_executor(
+            None, asyncio.run, queue.push_many([{'url': 'u0'}], 'scrape')))
+
+        assert await asyncio.wait_for(queue.pop_many(10, 'scrape'), 1) == [{'url': 'u0'}]
+
+    asyncio.run(run())
+
+
+def test_pop_due_returns_items_in_score_order():
+    async def run():
+        queue = InMemoryQueue()
+        await queue.schedule('late', 20, 'retry')
+        await queue.schedule('early', 10, 'retry')
+
+        assert await queue.pop_due(5, 10, 'retry') == []
+        assert await queue.pop_due(30, 10, 'retry') == ['early', 'late']
+        assert await queue.pop_due(30, 10, 'retry') == []
+
+    asyncio.run(run())
+
+
+def test_drain_costs_one_round_trip_per_chunk():
+    async def run():
+        items = [{'url': f'u{i}', 'request_id': f'r{i % 100}'} for i in range(10_000)]
+
+        single = CountingQueue()
+        await single.push_many(items, 'scrape')
+        while await single.pop('scrape') is not None:
+            pass
+
+        chunked = CountingQueue()
+        await chunked.push_many(items, 'scrape')
+        worker = ScrapeWorker(chunked, FakeScraper(), db, batch_size=50, max_pending=20_000)
+        drained = await worker.drain()
+
+        assert len(drained) == 10_000
+        assert single.calls == 10_001
+        # 200 full chunks plus the empty one that ends the drain
+        assert chunked.calls == 201
+        assert single.calls / chunked.calls > 10
+
+    asyncio.run(run())
+
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from src.datastore.models import Request, Review, Progress, ProgressStatus
+from src.worker.worker import RetentionWorker
+
+DONE, PENDING = ProgressStatus.DONE, ProgressStatus.PENDING
+
+
+def seed(database, now):
+    old = now - timedelta(days=40)
+    reviews = {
+        **{f'expired{i}': Review(url=f'https://expired{i}', updated_at=old) for i in range(7)},
+        'in_use': Review(url='https://in_use', updated_at=old),
+        'finished_only': Review(url='https://finished_only', updated_at=old),
+        'recent': Review(url='https://recent', updated_at=now - timedelta(days=1)),
+    }
+    database.session.add_all(reviews.values())
+    database.session.flush()
+
+    def request(request_id, created_at, *progress):
+        database.session.add(Request(id=request_id, email='customer@example.com', created_at=created_at))
+        for review, status in progress:
+            database.session.add(Progress(request_id=request_id, review_id=reviews[review].id, status=status))
+
+    for i in range(5):
+        request(f'finished{i}', now - timedelta(hours=2), ('finished_only', DONE), ('recent', DONE))
+    request('abandoned', now - timedelta(days=8), ('recent', PENDING))
+    request('in_progress', now - timedelta(hours=2), ('in_use', PENDING), ('recent', DONE))
+    request('just_submitted', now - timedelta(minutes=10), ('recent', DONE))
+
+    for _ in range(4):
+        database.session.add(Progress(request_id='deleted', review_id=reviews['recent'].id, status=PENDING))
+    database.session.commit()
+
+
+def touch(path, age=timedelta()):
+    path.write_text('url,location,reviewer,content\n')
+    mtime = time.time() - age.total_seconds()
+    os.utime(path, (mtime, mtime))
+
+
+def test_retention_removes_exactly_what_expired(database, tmp_path):
+    seed(database, datetime.now())
+    for i in range(5):
+        touch(tmp_path / f'finished{i}.csv')
+    touch(tmp_path / 'abandoned.csv')
+    touch(tmp_path / 'in_progress.csv')
+    touch(tmp_path / 'just_submitted.csv', age=timedelta(days=2))
+    touch(tmp_path / 'stray.csv')
+    touch(tmp_path / 'notes.txt', age=timedelta(days=2))
+
+    worker = RetentionWorker(database, chunk_size=3, temp_dir=str(tmp_path))
+    asyncio.run(worker.run())
+
+    assert {request_id for request_id, in database.session.query(Request.id)} == {'in_progress', 'just_submitted'}
+    assert sorted(
+        (request_id, url) for request_id, url in
+        database.session.query(Progress.request_id, Review.url).join(Review)
+    ) == [
+        ('in_progress', 'https://in_use'),
+        ('in_progress', 'https://recent'),
+        ('just_submitted', 'https://recent'),
+    ]
+    # the expired reviews and the one only the purged requests referenced are gone
+    assert {url for url, in database.session.query(Review.url)} == {'https://in_use', 'https://recent'}
+    assert sorted(os.listdir(tmp_path)) == ['in_progress.csv', 'notes.txt']
+
+
+def test_retention_is_idempotent(database, tmp_path):
+    seed(database, datetime.now())
+    worker = RetentionWorker(database, chunk_size=3, temp_dir=str(tmp_path))
+    asyncio.run(worker.run())
+    counts = [database.session.query(model).count() for model in (Request, Progress, Review)]
+
+    asyncio.run(worker.run())
+    assert [database.session.query(model).count() for model in (Request, Progress, Review)] == counts
@@ -0,0 +1,199 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+
+from src.app_services.scrape import make_task
+from src.datastore.models import Request, Review, Progress, ProgressStatus
+from src.datastore.utils import delete_requests
+from src.scraper import IScraper, TransientScrapeError, PermanentScrapeError
+from src.scraper.scraper_service import HTMLScraper
+from src.worker.queue import InMemoryQueue
+from src.worker.worker import ScrapeWorker, RetryWorker
+
+
+class FakeScraper(IScraper):
+    """Raises the queued outcome for a url, or returns a review once they run out."""
+
+    def __init__(self, outcomes=None):
+        self.outcomes = outcomes or {}
+        self.calls = []
+
+    async def scrape(self, url):
+        self.calls.append(url)
+        outcomes = self.outcomes.get(url, [])
+        if outcomes:
+            raise outcomes.pop(0)
+
+        return {'url': url, 'location': 'Location', 'reviewer': 'Reviewer', 'content': 'Content'}
+
+
+def submit(database, url, request_id='request'):
+    database.session.add(Request(id=request_id, email='customer@example.com'))
+    database.session.commit()
+    make_task(url, request_id)
+
+
+def statuses(database):
+    return [status for status, in database.session.query(Progress.status)]
+
+
+def content(database, url):
+    return database.session.query(Review.content).filter(Review.url == url).scalar()
+
+
+def test_retry_without_waiting_request_releases_url(database):
+    queue = InMemoryQueue(timeout=0.01)
+    scraper = FakeScraper({'url': [TransientScrapeError('HTTP 503'), TransientScrapeError('HTTP 503')]})
+    worker = ScrapeWorker(queue, scraper, database, base_delay=timedelta(0))
+    retry_worker = RetryWorker(worker)
+
+    submit(database, 'url')
+    asyncio.run(worker.save_results(['url'], [TransientScrapeError('HTTP 503')]))
+    assert 'url' in worker.retrying
+
+    # the request is purged while the url waits for its retry
+    delete_requests(database, ['request'])
+    asyncio.run(retry_worker.retry())
+
+    assert 'url' not in worker.retrying
+    assert asyncio.run(queue.get(worker.attempts_key('url'))) is None
+
+    # a new request for the url is scraped again instead of being ignored
+    worker.add_task({'url': 'url', 'request_id': 'next'})
+    assert 'url' in worker.pending_urls
+
+
+def test_failed_save_reschedules_retries(database):
+    queue = InMemoryQueue(timeout=0.01)
+    worker = ScrapeWorker(queue, FakeScraper(), database, base_delay=timedelta(seconds=30))
+    retry_worker = RetryWorker(worker)
+
+    submit(database, 'url')
+    asyncio.run(worker.save_results(['url'], [TransientScrapeError('HTTP 503')]))
+    asyncio.run(queue.schedule('url', 0, 'retry'))
+
+    async def locked(urls, results):
+        raise RuntimeError('database is locked')
+
+    worker.save_results = locked
+    asyncio.run(retry_worker.retry())
+
+    assert 'url' in worker.retrying
+    assert asyncio.run(queue.pop_due(time.time() + 60, 10, 'retry')) == ['url']
+
+
+def test_failed_save_without_queue_releases_retries(database):
+    queue = InMemoryQueue(timeout=0.01)
+    worker = ScrapeWorker(queue, FakeScraper(), database)
+    retry_worker = RetryWorker(worker)
+
+    submit(database, 'url')
+    asyncio.run(worker.save_results(['url'], [TransientScrapeError('HTTP 503')]))
+    asyncio.run(queue.schedule('url', 0, 'retry'))
+
+    async def locked(urls, results):
+        raise RuntimeError('database is locked')
+
+    async def unavailable(item, at, queue):
+        raise ConnectionError('queue is down')
+
+    worker.save_results = locked
+    queue.schedule = unavailable
+    with pytest.raises(ConnectionError):
+        asyncio.run(retry_worker.retry())
+
+    assert 'url' not in worker.retrying
+
+
+def test_transient_failure_is_scheduled_for_retry(database):
+    queue = InMemoryQueue(timeout=0.01)
+    worker = ScrapeWorker(queue, FakeScraper(), database, base_delay=timedelta(seconds=30))
+
+    submit(database, 'url')
+    before = time.time()
+    asyncio.run(worker.save_results(['url'], [TransientScrapeError('HTTP 429')]))
+
+    assert 'url' in worker.retrying
+    assert asyncio.run(queue.pop_due(before + 29, 10, 'retry')) == []
+    assert asyncio.run(queue.pop_due(before + 31, 10, 'retry')) == ['url']
+    assert asyncio.run(queue.len('dead_letter')) == 0
+    assert statuses(database) == [ProgressStatus.PENDING]
+    assert content(database, 'url') is None
+
+
+def test_backoff_doubles_per_attempt(database):
+    queue = InMemoryQueue(timeout=0.01)
+    worker = ScrapeWorker(queue, FakeScraper(), database, max_attempts=5,
+                          base_delay=timedelta(seconds=30), max_delay=timedelta(seconds=100))
+
+    submit(database, 'url')
+    delays = []
+    for _ in range(4):
+        before = time.time()
+        asyncio.run(worker.save_results(['url'], [TransientScrapeError('HTTP 503')]))
+        score = queue.sorted_sets['retry'].pop('"url"')
+        delays.append(round(score - before))
+
+    assert delays == [30, 60, 100, 100]
+
+
+def test_exhausted_retries_are_dead_lettered(database):
+    queue = InMemoryQueue(timeout=0.01)
+    scraper = FakeScraper({'url': [TransientScrapeError('HTTP 503')]})
+    worker = ScrapeWorker(queue, scraper, database, max_attempts=2, base_delay=timedelta(0))
+    retry_worker = RetryWorker(worker)
+
+    submit(database, 'url')
+    asyncio.run(worker.save_results(['url'], [TransientScrapeError('HTTP 503')]))
+    asyncio.run(retry_worker.retry())
+
+    assert scraper.calls == ['url']
+    assert 'url' not in worker.retrying
+    assert asyncio.run(queue.pop_due(time.time() + 3600, 10, 'retry')) == []
+
+    dead = asyncio.run(queue.range('dead_letter'))
+    assert [(item['url'], item['kind']) for item in dead] == [('url', 'transient')]
+    assert content(database, 'url') == 'Error'
+    assert statuses(database) == [ProgressStatus.NOTIFYING]
+
+
+def test_success_clears_attempts(database):
+    queue = InMemoryQueue(timeout=0.01)
+    worker = ScrapeWorker(queue, FakeScraper(), database, base_delay=timedelta(0))
+    retry_worker = RetryWorker(worker)
+
+    submit(database, 'url')
+    asyncio.run(worker.save_results(['url'], [TransientScrapeError('HTTP 503')]))
+    assert asyncio.run(queue.get(worker.attempts_key('url'))) == 1
+
+    asyncio.run(retry_worker.retry())
+
+    assert asyncio.run(queue.get(worker.attempts_key('url'))) is None
+    assert 'url' not in worker.retrying
+    assert content(database, 'url') == 'Content'
+    assert statuses(database) == [ProgressStatus.NOTIFYING]
+
+
+def test_permanent_failure_is_dead_lettered_immediately(database):
+    queue = InMemoryQueue(timeout=0.01)
+    worker = ScrapeWorker(queue, FakeScraper(), database)
+
+    submit(database, 'url')
+    asyncio.run(worker.save_results(['url'], [PermanentScrapeError('no review markup')]))
+
+    assert 'url' not in worker.retrying
+    assert asyncio.run(queue.pop_due(time.time() + 3600, 10, 'retry')) == []
+    assert asyncio.run(queue.get(worker.attempts_key('url'))) is None
+
+    dead = asyncio.run(queue.range('dead_letter'))
+    assert [(item['url'], item['kind']) for item in dead] == [('url', 'permanent')]
+    assert content(database, 'url') == 'Error'
+    assert statuses(database) == [ProgressStatus.NOTIFYING]
+
+
+@pytest.mark.parametrize('url', ['not-a-url', 'http://', 'ftp://x/y'])
+def test_invalid_urls_are_permanent(url):
+    with pytest.raises(PermanentScrapeError):
+        asyncio.run(HTMLScraper().scrape(url))
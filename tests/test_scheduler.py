@@ -0,0 +1,139 @@
+from collections import deque
+
+from src.utils import RollingPercentile
+from src.worker.scheduler import FairScheduler
+
+
+def fill(scheduler, key, urls):
+    for url in urls:
+        scheduler.add(url, key)
+
+
+def test_nearly_finished_requests_are_served_first():
+    scheduler = FairScheduler(boost_remaining=2)
+    fill(scheduler, 'large', ['l0', 'l1', 'l2', 'l3', 'l4'])
+    fill(scheduler, 'two', ['t0', 't1'])
+    fill(scheduler, 'one', ['o0'])
+
+    assert scheduler.pop(3) == ['o0', 't0', 't1']
+    assert scheduler.pop(10) == ['l0', 'l1', 'l2', 'l3', 'l4']
+    assert len(scheduler) == 0
+    assert not scheduler.queues and not scheduler.remaining
+
+
+def test_large_requests_share_a_batch_round_robin():
+    scheduler = FairScheduler(boost_remaining=0)
+    fill(scheduler, 'a', ['a0', 'a1', 'a2'])
+    fill(scheduler, 'b', ['b0', 'b1', 'b2'])
+
+    assert scheduler.pop(4) == ['a0', 'b0', 'a1', 'b1']
+    assert scheduler.pop(4) == ['a2', 'b2']
+
+
+def test_url_shared_by_requests_is_handed_out_once():
+    scheduler = FairScheduler(boost_remaining=0)
+    fill(scheduler, 'a', ['a0', 'shared', 'a2', 'a3'])
+    fill(scheduler, 'b', ['shared', 'b1', 'b2', 'b3'])
+
+    assert len(scheduler) == 7
+    assert scheduler.pop(2) == ['a0', 'shared']
+    assert scheduler.remaining == {'a': 2, 'b': 3}
+    assert scheduler.pop(10) == ['a2', 'b1', 'a3', 'b2', 'b3']
+    assert not scheduler.queues and not scheduler.remaining
+
+
+def test_refreshes_without_request_are_never_boosted():
+    scheduler = FairScheduler(boost_remaining=2)
+    scheduler.add('refresh', None)
+    fill(scheduler, 'a', ['a0', 'a1'])
+
+    assert scheduler.pop(1) == ['a0']
+    assert scheduler.pop(5) == ['a1', 'refresh']
+
+
+def test_url_can_be_queued_again_after_it_was_handed_out():
+    scheduler = FairScheduler(boost_remaining=0)
+    fill(scheduler, 'a', ['x', 'y'])
+    scheduler.add('x', 'a')
+
+    assert scheduler.pop(1) == ['x']
+    assert 'x' not in scheduler
+
+    scheduler.add('x', 'a')
+    assert 'x' in scheduler
+    assert scheduler.remaining == {'a': 2}
+    assert scheduler.pop(5) == ['y', 'x']
+    assert len(scheduler) == 0
+
+
+class FifoScheduler:
+    """The scheduler the worker used before: one queue in arrival order."""
+
+    def __init__(self):
+        self.urls = deque()
+
+    def add(self, url, key=None):
+        self.urls.append(url)
+
+    def pop(self, n):
+        return [self.urls.popleft() for _ in range(min(n, len(self.urls)))]
+
+
+def mixed_workload(every=4, ticks=400):
+    """Every `every` ticks one 50 URL request arrives, followed by ten 1 URL requests."""
+    requests = []
+    for tick in range(0, ticks, every):
+        requests.append((tick, f'large{tick}', 50))
+        requests.extend((tick, f'small{tick}-{i}', 1) for i in range(10))
+    return requests
+
+
+def simulate(scheduler, requests, batch_size):
+    """
+    Runs one scrape batch per tick and returns the ticks from arrival to email
+    for every request, the email going out once its last URL was scraped.
+    """
+    owner, arrived, remaining, latency = {}, {}, {}, {}
+    arrivals = deque(sorted(requests))
+    tick = 0
+
+    while len(latency) < len(requests):
+        while arrivals and arrivals[0][0] <= tick:
+            tick_arrived, request_id, size = arrivals.popleft()
+            arrived[request_id] = tick_arrived
+            remaining[request_id] = size
+            for i in range(size):
+                owner[f'{request_id}/{i}'] = request_id
+                scheduler.add(f'{request_id}/{i}', request_id)
+
+        tick += 1
+        for url in scheduler.pop(batch_size):
+            request_id = owner[url]
+            remaining[request_id] -= 1
+            if remaining[request_id] == 0:
+                latency[request_id] = tick - arrived[request_id]
+
+    return latency
+
+
+def percentile(latency, p, prefix=''):
+    samples = RollingPercentile(size=len(latency))
+    for request_id, ticks in latency.items():
+        if request_id.startswith(prefix):
+            samples.add(ticks)
+    return samples.percentile(p)
+
+
+def test_fair_scheduler_cuts_latency_of_small_requests():
+    # 60 URLs every 4 ticks against 16 per batch keeps the worker ~94% busy
+    requests = mixed_workload(every=4, ticks=400)
+    fifo = simulate(FifoScheduler(), requests, batch_size=16)
+    fair = simulate(FairScheduler(), requests, batch_size=16)
+
+    print(f'fifo p50={percentile(fifo, 50)} p95={percentile(fifo, 95)} small p95={percentile(fifo, 95, "small")}')
+    print(f'fair p50={percentile(fair, 50)} p95={percentile(fair, 95)} small p95={percentile(fair, 95, "small")}')
+
+    assert percentile(fair, 95, 'small') < percentile(fifo, 95, 'small')
+    assert percentile(fair, 50) < percentile(fifo, 50)
+    assert percentile(fair, 95) <= percentile(fifo, 95)
+    assert percentile(fair, 100, 'large') <= percentile(fifo, 100, 'large')